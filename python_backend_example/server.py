@@ -14,10 +14,25 @@ import tempfile
 import xml.etree.ElementTree as ET
 import pkg_resources
 import re
-from threading import Thread
+import sys
+import hashlib
+import hmac
+import sqlite3
+import gzip
+import base64
+import copy
+import io
+import urllib.request
+import urllib.error
+from threading import Thread, Lock
 from collections import deque
 import json
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -37,6 +52,56 @@ REPORTS_DIR = os.path.join(SCRIPT_DIR, 'reports_archive')
 if not os.path.exists(REPORTS_DIR):
     os.makedirs(REPORTS_DIR)
 
+# Opt-in suite result cache. Passing suites whose inputs have not changed are
+# skipped on the next run and their stored results are merged into the report.
+RESULT_CACHE_DIR = os.path.join(SCRIPT_DIR, 'result_cache')
+RESULT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+RESULT_CACHE_MAX_ENTRIES = 500
+if not os.path.exists(RESULT_CACHE_DIR):
+    os.makedirs(RESULT_CACHE_DIR)
+
+# Distributed execution. A "coordinator" splits /run into shards and dispatches
+# them to "worker" instances of this same server, which register themselves by
+# sending heartbeats to ROBOT_MAESTRO_COORDINATOR_URL.
+SERVER_ROLE = os.environ.get('ROBOT_MAESTRO_ROLE', 'standalone')  # 'standalone', 'coordinator' or 'worker'
+SERVER_HOST = os.environ.get('ROBOT_MAESTRO_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('ROBOT_MAESTRO_PORT', '5001'))
+COORDINATOR_URL = os.environ.get('ROBOT_MAESTRO_COORDINATOR_URL')
+WORKER_URL = os.environ.get('ROBOT_MAESTRO_WORKER_URL', f'http://{SERVER_HOST}:{SERVER_PORT}')
+WORKER_CAPACITY = int(os.environ.get('ROBOT_MAESTRO_WORKER_CAPACITY', '1'))
+# Shared secret for the coordinator/worker routes. Without it they only accept requests from this machine.
+CLUSTER_TOKEN = os.environ.get('ROBOT_MAESTRO_CLUSTER_TOKEN')
+CLUSTER_TOKEN_HEADER = 'X-Robot-Maestro-Token'
+WORKER_HEARTBEAT_INTERVAL_SECONDS = 5
+WORKER_HEARTBEAT_TIMEOUT_SECONDS = 20
+SHARD_MAX_ATTEMPTS = 3
+SHARD_ID_PATTERN = re.compile(r'^[0-9A-Za-z-]+$')
+
+# Resource profiling of the robot process group (requires psutil)
+RESOURCE_PROFILER_ENABLED = True
+RESOURCE_PROFILER_INTERVAL_SECONDS = 1.0
+
+# Full-text search over archived runs (SQLite FTS5), updated as runs are archived and deleted
+SEARCH_INDEX_PATH = os.path.join(SCRIPT_DIR, 'search_index.sqlite')
+SEARCH_MAX_MESSAGE_LENGTH = 2000
+SEARCH_CONSOLE_LINES_PER_DOCUMENT = 20
+
+# Retention of archived runs and project copies, applied by a background sweep
+RETENTION_INTERVAL_SECONDS = 15 * 60
+RETENTION_KEEP_FULL_RUNS = 20  # Newer runs are never compressed or evicted
+RETENTION_VIDEO_DOWNSCALE_AFTER_DAYS = 7  # Requires ffmpeg
+RETENTION_VIDEO_DOWNSCALE_HEIGHT = 480
+RETENTION_VIDEO_DELETE_AFTER_DAYS = 30
+RETENTION_MAX_PROJECT_COPIES = 10
+RETENTION_DISK_BUDGET_BYTES = 5 * 1024 ** 3  # For REPORTS_DIR and PROJECTS_BASE_DIR combined
+
+# Post-run video processing (faststart remux, test chapters, thumbnail sprite), skipped without ffmpeg
+VIDEO_PIPELINE_ENABLED = True
+VIDEO_THUMBNAIL_INTERVAL_SECONDS = 5
+VIDEO_THUMBNAIL_MAX_COUNT = 100
+VIDEO_THUMBNAIL_WIDTH = 160
+VIDEO_THUMBNAIL_COLUMNS = 10
+
 
 # --- Global State ---
 class ExecutionState:
@@ -49,8 +114,13 @@ class ExecutionState:
         self.report_file = None
         self.log_file = None
         self.video_file = None
+        self.video_markers_file = None
         self.return_code = None
         self.orchestrator_data = None
+        self.distributed = False
+        self.resource_sampler = None
+        self.profile_interval = None
+        self.profile_file = None
 
     def reset(self):
         self.__init__()
@@ -64,6 +134,7 @@ def set_active_directory(path):
     # Normalize path for consistent representation
     normalized_path = os.path.abspath(path)
     TESTS_DIRECTORY = normalized_path
+    mark_project_used(TESTS_DIRECTORY)
     print(f"INFO: Active test directory set to: {TESTS_DIRECTORY}")
 
 def find_robot_files_and_get_root(directory):
@@ -216,9 +287,10 @@ def install_missing_dependencies_thread(missing_packages):
         state.process = None
 
 
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.avi', '.mov')
+
 def find_video_in_dir(directory):
     """Finds the most recently modified video file in a directory."""
-    video_extensions = ('.mp4', '.webm', '.avi', '.mov')
     latest_video = None
     latest_time = 0
 
@@ -227,7 +299,7 @@ def find_video_in_dir(directory):
 
     for root, _, files in os.walk(directory):
         for file in files:
-            if file.lower().endswith(video_extensions):
+            if file.lower().endswith(VIDEO_EXTENSIONS):
                 file_path = os.path.join(root, file)
                 mod_time = os.path.getmtime(file_path)
                 if mod_time > latest_time:
@@ -275,6 +347,81 @@ def parse_test_statistics_from_xml(output_dir):
         state.logs.append(f"Error parsing output.xml: {e}")
         return 0, 0
 
+def parse_robot_timestamp(value):
+    """Converts an output.xml timestamp (RF 7 ISO format or the older '20250831 11:55:03.123') to epoch seconds."""
+    if not value or value == 'N/A':
+        return None
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y%m%d %H:%M:%S.%f'):
+        try:
+            return datetime.datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+def find_failing_step(element):
+    """Follows the failing keywords (and FOR, IF, TRY... blocks) down from a failed test to the step that failed it.
+
+    Returns the status element of that step. Failures that a keyword handled, e.g. inside
+    'Run Keyword And Ignore Error', are skipped because their parent keyword passed.
+    """
+    status = element.find('status')
+    while True:
+        failing = []
+        for child in element:
+            child_status = child.find('status') if child.tag not in ('status', 'msg') else None
+            if child_status is not None and child_status.get('status') == 'FAIL':
+                failing.append((child, child_status))
+        if not failing:
+            return status
+        # A failing teardown only matters when the body itself did not fail
+        body = [item for item in failing if (item[0].get('type') or '').upper() != 'TEARDOWN']
+        element, status = (body or failing)[-1]
+
+def parse_test_timeline_from_xml(output_dir):
+    """Returns every test in output.xml with its suite, status and start/end times in epoch seconds."""
+    output_xml_path = os.path.join(output_dir, 'output.xml')
+    if not os.path.exists(output_xml_path):
+        return []
+
+    timeline = []
+
+    def visit_suite(suite_element, parent_name):
+        suite_name = f"{parent_name}.{suite_element.get('name')}" if parent_name else suite_element.get('name')
+        for test in suite_element.findall('test'):
+            status = test.find('status')
+            if status is None:
+                continue
+            start = parse_robot_timestamp(status.get('start') or status.get('starttime'))
+            if status.get('elapsed') is not None and start is not None:
+                end = start + float(status.get('elapsed'))
+            else:
+                end = parse_robot_timestamp(status.get('endtime'))
+            failed_at = None
+            if status.get('status') == 'FAIL':
+                failure = find_failing_step(test)
+                failed_at = parse_robot_timestamp(failure.get('start') or failure.get('starttime'))
+            timeline.append({
+                "name": test.get('name'),
+                "suite": suite_name,
+                "source": suite_element.get('source'),
+                "status": status.get('status'),
+                "message": (status.text or '').strip(),
+                "start": start,
+                "end": end,
+                "failed_at": failed_at
+            })
+        for child in suite_element.findall('suite'):
+            visit_suite(child, suite_name)
+
+    try:
+        root = ET.parse(output_xml_path).getroot()
+        for suite in root.findall('suite'):
+            visit_suite(suite, None)
+    except Exception as e:
+        state.logs.append(f"Error parsing test timeline from output.xml: {e}")
+    timeline.sort(key=lambda t: t['start'] or 0)
+    return timeline
+
 def create_variable_file_from_data(timestamp):
     if not state.orchestrator_data:
         return None
@@ -312,16 +459,584 @@ def create_variable_file_from_data(timestamp):
     
     return var_file_path
 
+# --- Result Cache ---
+result_cache_lock = Lock()
+RESULT_CACHE_INDEX = os.path.join(RESULT_CACHE_DIR, 'index.json')
+SETTINGS_IMPORT_PATTERN = re.compile(r'^(Resource|Variables|Library)(?:\s{2,}|\t)+(\S.*?)(?:(?:\s{2,}|\t).*)?$', re.IGNORECASE)
 
-def run_robot_in_thread(command, output_dir, timestamp):
-    global state
-    output_dir = os.path.abspath(output_dir)
+def find_suite_files(directory):
+    """Returns the .robot files under a directory that contain test cases."""
+    suite_files = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith('.robot') and file != '__init__.robot':
+                file_path = os.path.join(root, file)
+                if parse_robot_file(file_path):
+                    suite_files.append(file_path)
+    suite_files.sort()
+    return suite_files
+
+def find_imported_files(file_path):
+    """Returns the files imported in a file's Settings section, and the imports that could not be resolved to a file."""
+    imported = []
+    unresolved = []
+    in_settings_section = False
+    base_dir = os.path.dirname(file_path)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                stripped_line = line.strip()
+                if stripped_line.startswith('***'):
+                    in_settings_section = stripped_line.lower().startswith('*** settings ***')
+                    continue
+                if not in_settings_section:
+                    continue
+                match = SETTINGS_IMPORT_PATTERN.match(stripped_line)
+                if not match:
+                    continue
+                import_path = match.group(2).replace('${CURDIR}', base_dir)
+                # Robot is started from the test directory, so that is its execution directory
+                if TESTS_DIRECTORY:
+                    import_path = import_path.replace('${EXECDIR}', TESTS_DIRECTORY)
+                import_path = import_path.replace('/', os.sep)
+                # Libraries imported by module name are covered by the environment fingerprint
+                if match.group(1).lower() == 'library' and not import_path.endswith('.py') and '${' not in import_path:
+                    continue
+                candidate = os.path.normpath(os.path.join(base_dir, import_path))
+                if '${' in import_path:
+                    unresolved.append(match.group(2))
+                elif os.path.isfile(candidate):
+                    imported.append(candidate)
+                elif TESTS_DIRECTORY and os.path.isfile(os.path.join(TESTS_DIRECTORY, import_path)):
+                    imported.append(os.path.normpath(os.path.join(TESTS_DIRECTORY, import_path)))
+                else:
+                    unresolved.append(match.group(2))
+    except Exception as e:
+        print(f"Could not scan imports of {file_path}: {e}")
+        unresolved.append(file_path)
+    return imported, unresolved
+
+def collect_suite_dependencies(suite_path):
+    """Returns the suite file, its __init__ files and their transitive imports, plus any unresolvable imports."""
+    pending = [suite_path]
+    directory = os.path.dirname(suite_path)
+    while TESTS_DIRECTORY and directory.startswith(TESTS_DIRECTORY):
+        init_file = os.path.join(directory, '__init__.robot')
+        if os.path.isfile(init_file):
+            pending.append(init_file)
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+
+    dependencies = set()
+    unresolved = []
+    while pending:
+        file_path = pending.pop()
+        if file_path in dependencies:
+            continue
+        dependencies.add(file_path)
+        if file_path.endswith(('.robot', '.resource', '.txt')):
+            imported, unresolved_imports = find_imported_files(file_path)
+            pending.extend(imported)
+            unresolved.extend(unresolved_imports)
+    return sorted(dependencies), unresolved
+
+def get_environment_fingerprint():
+    """Hashes the interpreter and installed packages so environment changes invalidate the cache."""
+    packages = sorted(get_installed_packages().items())
+    fingerprint = json.dumps({
+        'python': sys.version,
+        'platform': sys.platform,
+        'packages': packages
+    })
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+def compute_suite_cache_key(suite_path, selection, orchestrator_data, environment_fingerprint):
+    """Returns the suite's cache key, or None when an import cannot be resolved and the suite must not be cached."""
+    dependencies, unresolved = collect_suite_dependencies(suite_path)
+    if unresolved:
+        state.logs.append(
+            f"Result cache: not caching {os.path.relpath(suite_path, TESTS_DIRECTORY)}, "
+            f"cannot resolve import(s): {', '.join(unresolved)}"
+        )
+        return None
+
+    digest = hashlib.sha256()
+    digest.update(environment_fingerprint.encode('utf-8'))
+    digest.update(json.dumps(selection, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(orchestrator_data, sort_keys=True).encode('utf-8'))
+    for dependency in dependencies:
+        digest.update(os.path.relpath(dependency, TESTS_DIRECTORY).replace('\\', '/').encode('utf-8'))
+        with open(dependency, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def load_result_cache_index():
+    if not os.path.exists(RESULT_CACHE_INDEX):
+        return {}
+    try:
+        with open(RESULT_CACHE_INDEX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Could not read result cache index, starting empty: {e}")
+        return {}
+
+def save_result_cache_index(index):
+    temp_path = RESULT_CACHE_INDEX + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, RESULT_CACHE_INDEX)
+
+def evict_result_cache_entries(index):
+    """Drops expired entries, then the oldest ones until the index fits RESULT_CACHE_MAX_ENTRIES."""
+    now = time.time()
+    expired = [key for key, entry in index.items() if now - entry.get('created', 0) > RESULT_CACHE_TTL_SECONDS]
+    by_age = sorted((key for key in index if key not in expired), key=lambda key: index[key].get('created', 0))
+    overflow = by_age[:max(0, len(by_age) - RESULT_CACHE_MAX_ENTRIES)]
+    for key in expired + overflow:
+        entry = index.pop(key)
+        output_path = os.path.join(RESULT_CACHE_DIR, entry.get('output_file', ''))
+        if entry.get('output_file') and os.path.exists(output_path):
+            os.remove(output_path)
+    return index
+
+def plan_cached_run(run_type, config, tests_to_run_path):
+    """Splits the suites of a run into cache hits and suites that still have to be executed."""
+    suite_files = [tests_to_run_path] if os.path.isfile(tests_to_run_path) else find_suite_files(tests_to_run_path)
+    selection = {
+        'runType': run_type,
+        'includeTags': config.get('includeTags'),
+        'excludeTags': config.get('excludeTags'),
+        'testcase': config.get('testcase')
+    }
+    environment_fingerprint = get_environment_fingerprint()
+    force = bool(config.get('forceRun'))
+
+    with result_cache_lock:
+        index = evict_result_cache_entries(load_result_cache_index())
+        save_result_cache_index(index)
+
+    plan = {'keys': {}, 'hits': {}, 'misses': []}
+    for suite_path in suite_files:
+        key = compute_suite_cache_key(suite_path, selection, state.orchestrator_data, environment_fingerprint)
+        plan['keys'][suite_path] = key
+        entry = index.get(key) if key else None
+        if entry and not force and os.path.exists(os.path.join(RESULT_CACHE_DIR, entry['output_file'])):
+            plan['hits'][suite_path] = entry
+        else:
+            plan['misses'].append(suite_path)
+    return plan
+
+def get_suite_sort_key(suite_element):
+    source = suite_element.get('source')
+    return (os.path.basename(source) if source else suite_element.get('name') or '').lower()
+
+def is_same_suite(first, second):
+    if first.get('source') and second.get('source'):
+        return os.path.normcase(os.path.abspath(first.get('source'))) == os.path.normcase(os.path.abspath(second.get('source')))
+    return first.get('name') == second.get('name')
+
+def insert_child_suite(parent, suite_element):
+    """Inserts a child suite where Robot writes it: after the parent's setup, ordered with its sibling suites."""
+    siblings = parent.findall('suite')
+    for sibling in siblings:
+        parent.remove(sibling)
+    siblings.append(suite_element)
+    siblings.sort(key=get_suite_sort_key)
+    index = 0
+    for i, child in enumerate(parent):
+        if child.tag == 'kw' and (child.get('type') or '').upper() == 'SETUP':
+            index = i + 1
+    for offset, sibling in enumerate(siblings):
+        parent.insert(index + offset, sibling)
+
+def graft_suite_tree(target_parent, suite_element):
+    """Merges a suite into target_parent, descending into a matching existing suite instead of duplicating it."""
+    existing = next((s for s in target_parent.findall('suite') if is_same_suite(s, suite_element)), None)
+    if existing is None:
+        insert_child_suite(target_parent, suite_element)
+        return
+    for child in suite_element.findall('suite'):
+        graft_suite_tree(existing, child)
+
+def copy_suite_shell(suite_element):
+    """Copies a suite without its child suites and tests, keeping its setup, teardown, metadata and status."""
+    shell = ET.Element('suite', suite_element.attrib)
+    for child in suite_element:
+        if child.tag not in ('suite', 'test'):
+            shell.append(copy.deepcopy(child))
+    return shell
+
+def extract_suite_output(root, suite_element, destination):
+    """Writes one suite, nested in shells of its parent suites, as a standalone output file Rebot can read."""
+    parents = {child: parent for parent in root.iter() for child in parent}
+    ancestors = []
+    parent = parents.get(suite_element)
+    while parent is not None and parent.tag == 'suite':
+        ancestors.insert(0, parent)
+        parent = parents.get(parent)
+
+    cached_root = ET.Element(root.tag, root.attrib)
+    container = cached_root
+    for ancestor in ancestors:
+        shell = copy_suite_shell(ancestor)
+        insert_child_suite(container, shell)
+        container = shell
+    insert_child_suite(container, suite_element)
+    ET.SubElement(cached_root, 'statistics')
+    ET.SubElement(cached_root, 'errors')
+    ET.ElementTree(cached_root).write(destination, encoding='utf-8', xml_declaration=True)
+
+def store_passing_suites(plan, output_dir):
+    """Caches every executed suite from the plan whose result in output.xml is PASS."""
+    output_xml_path = os.path.join(output_dir, 'output.xml')
+    if not os.path.exists(output_xml_path):
+        return
+
+    root = ET.parse(output_xml_path).getroot()
+    suites_by_source = {os.path.normcase(os.path.abspath(s.get('source'))): s for s in root.iter('suite') if s.get('source')}
 
+    with result_cache_lock:
+        index = load_result_cache_index()
+        for suite_path in plan['misses']:
+            suite_element = suites_by_source.get(os.path.normcase(os.path.abspath(suite_path)))
+            key = plan['keys'][suite_path]
+            if suite_element is None or key is None:
+                continue
+            status = suite_element.find('status')
+            tests = list(suite_element.iter('test'))
+            if status is None or status.get('status') != 'PASS' or not tests:
+                continue
+            output_file = f"{key}.xml"
+            extract_suite_output(root, suite_element, os.path.join(RESULT_CACHE_DIR, output_file))
+            index[key] = {
+                'suite': os.path.relpath(suite_path, TESTS_DIRECTORY).replace('\\', '/'),
+                'output_file': output_file,
+                'pass': len(tests),
+                'created': time.time()
+            }
+        save_result_cache_index(evict_result_cache_entries(index))
+
+def merge_output_trees(output_files, destination):
+    """Grafts the suites of several output.xml files into the first one's suite tree, keeping the original nesting."""
+    base_tree = ET.parse(output_files[0])
+    base_root = base_tree.getroot()
+    base_errors = base_root.find('errors')
+    for output_file in output_files[1:]:
+        root = ET.parse(output_file).getroot()
+        for suite in root.findall('suite'):
+            graft_suite_tree(base_root, suite)
+        errors = root.find('errors')
+        if errors is not None and base_errors is not None:
+            base_errors.extend(list(errors))
+    base_tree.write(destination, encoding='utf-8', xml_declaration=True)
+
+def merge_output_files(output_files, output_dir):
+    """Combines several output.xml files into output.xml, report.html and log.html in output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    merged_output = os.path.join(output_dir, 'merged-output.xml')
+    merge_output_trees(output_files, merged_output)
+    # Shards whose filter matched no tests produce empty suites, which rebot rejects by default
+    command = [
+        'rebot', '--outputdir', output_dir, '--processemptysuite',
+        '--output', 'output.xml', '--report', 'report.html', '--log', 'log.html', merged_output
+    ]
+    process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    # Rebot's return code is the number of failed tests, so check for the output instead
+    if not os.path.exists(os.path.join(output_dir, 'output.xml')):
+        raise RuntimeError(f"rebot did not produce output.xml: {process.stdout.strip()}")
+
+def apply_result_cache(plan, output_dir):
+    """Stores newly passing suites and merges cached suite results into the run's output."""
+    try:
+        store_passing_suites(plan, output_dir)
+    except Exception as e:
+        state.logs.append(f"Could not update result cache: {e}")
+
+    if not plan['hits']:
+        return
+
+    output_files = []
+    executed_output = os.path.join(output_dir, 'output.xml')
+    if os.path.exists(executed_output):
+        executed_copy = os.path.join(output_dir, 'executed-output.xml')
+        os.replace(executed_output, executed_copy)
+        output_files.append(executed_copy)
+    output_files.extend(os.path.join(RESULT_CACHE_DIR, entry['output_file']) for entry in plan['hits'].values())
+
+    merge_output_files(output_files, output_dir)
+    state.logs.append(f"Merged cached results of {len(plan['hits'])} suite(s) into the report.")
+
+# --- Distributed Execution ---
+workers = {}
+workers_lock = Lock()
+worker_shards = {}
+worker_shards_lock = Lock()
+
+def cluster_headers():
+    """Returns the headers that authenticate this server to other Robot Maestro servers."""
+    return {CLUSTER_TOKEN_HEADER: CLUSTER_TOKEN} if CLUSTER_TOKEN else {}
+
+def http_json(method, url, payload=None, timeout=30):
+    """Sends a JSON request to another Robot Maestro server and returns the decoded response."""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = dict(cluster_headers(), **{'Content-Type': 'application/json'})
+    http_request = urllib.request.Request(url, data=data, method=method, headers=headers)
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def terminate_process_group(process):
+    """Terminates a process started in its own process group, including its children."""
+    if os.name == 'nt':
+        process.send_signal(signal.CTRL_BREAK_EVENT)
+    else:
+        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+
+def get_live_workers():
+    now = time.time()
+    with workers_lock:
+        return [dict(w) for w in workers.values() if now - w['last_seen'] <= WORKER_HEARTBEAT_TIMEOUT_SECONDS]
+
+def is_worker_alive(url):
+    with workers_lock:
+        worker = workers.get(url)
+        return worker is not None and time.time() - worker['last_seen'] <= WORKER_HEARTBEAT_TIMEOUT_SECONDS
+
+def build_project_archive(directory):
+    """Zips a project directory and returns (content hash, base64 zip) for shipping to workers."""
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d not in ('.git', 'Execution_Videos', '__pycache__'))
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                relative_path = os.path.relpath(file_path, directory).replace('\\', '/')
+                with open(file_path, 'rb') as f:
+                    content = f.read()
+                digest.update(relative_path.encode('utf-8'))
+                digest.update(hashlib.sha256(content).digest())
+                archive.writestr(relative_path, content)
+    return digest.hexdigest(), base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def split_into_shards(suite_files, shard_count):
+    """Balances suites over shards by file size, largest first, as a rough proxy for duration."""
+    shards = [[] for _ in range(max(1, min(shard_count, len(suite_files))))]
+    loads = [0] * len(shards)
+    for suite_path in sorted(suite_files, key=os.path.getsize, reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(os.path.relpath(suite_path, TESTS_DIRECTORY).replace('\\', '/'))
+        loads[target] += os.path.getsize(suite_path)
+    return [sorted(shard) for shard in shards if shard]
+
+def create_distributed_job(suite_files, robot_options, variable_file):
+    live_workers = get_live_workers()
+    total_capacity = sum(w['capacity'] for w in live_workers)
+    # Twice as many shards as slots lets faster workers pick up more of the work
+    shard_suites = split_into_shards(suite_files, total_capacity * 2)
+    project_hash, project_archive = build_project_archive(TESTS_DIRECTORY)
+
+    variable_file_content = None
+    if variable_file:
+        with open(variable_file, 'r', encoding='utf-8') as f:
+            variable_file_content = f.read()
+
+    return {
+        'project_hash': project_hash,
+        'project_archive': project_archive,
+        'source_root': TESTS_DIRECTORY,
+        'robot_options': robot_options,
+        'variable_file_content': variable_file_content,
+        'shards': [{'index': i, 'suites': suites, 'attempts': 0} for i, suites in enumerate(shard_suites)]
+    }
+
+def dispatch_shard(job, shard, worker_url, shard_id):
+    payload = {
+        'shard_id': shard_id,
+        'project_hash': job['project_hash'],
+        'source_root': job['source_root'],
+        'suites': shard['suites'],
+        'robot_options': job['robot_options'],
+        'variable_file_content': job['variable_file_content']
+    }
+    try:
+        http_json('POST', f"{worker_url}/worker/shards", payload)
+    except urllib.error.HTTPError as e:
+        if e.code != 409:
+            raise
+        # The worker has not seen this project version yet
+        payload['project_archive'] = job['project_archive']
+        http_json('POST', f"{worker_url}/worker/shards", payload, timeout=120)
+
+def fetch_shard_output(worker_url, shard_id, destination):
+    """Downloads a finished shard's output.xml. Returns False when the shard produced none."""
+    try:
+        http_request = urllib.request.Request(f"{worker_url}/worker/shards/{shard_id}/output", headers=cluster_headers())
+        with urllib.request.urlopen(http_request, timeout=120) as response:
+            with open(destination, 'wb') as f:
+                shutil.copyfileobj(response, f)
+        return True
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return False
+        raise
+
+def release_shard(worker_url, shard_id, stop=False):
+    try:
+        if stop:
+            http_json('POST', f"{worker_url}/worker/shards/{shard_id}/stop")
+        http_json('DELETE', f"{worker_url}/worker/shards/{shard_id}")
+    except Exception as e:
+        print(f"Could not release shard {shard_id} on {worker_url}: {e}")
+
+def run_distributed_job(job, output_dir, timestamp):
+    """Dispatches shards to live workers, streams their logs and merges their output.xml files."""
+    shard_output_dir = os.path.join(output_dir, 'shards')
+    os.makedirs(shard_output_dir, exist_ok=True)
+    pending = deque(job['shards'])
+    active = {}  # shard_id -> {'shard', 'worker', 'log_offset', 'failures'}
+    assigned = {}  # worker url -> number of shards currently assigned
+    shard_outputs = []
+    return_codes = []
+    workerless_since = None
+    state.logs.append(f"Distributing {len(job['shards'])} shard(s) across {len(get_live_workers())} worker(s).")
+
+    def requeue(shard_id, reason):
+        entry = active.pop(shard_id)
+        assigned[entry['worker']] -= 1
+        shard = entry['shard']
+        state.logs.append(f"[shard {shard['index']}] {reason}")
+        if shard['attempts'] >= SHARD_MAX_ATTEMPTS:
+            raise RuntimeError(f"Shard {shard['index']} failed after {shard['attempts']} attempts.")
+        pending.appendleft(shard)
+
+    try:
+        while pending or active:
+            if state.status == 'stopped':
+                return
+
+            # Fill free slots, preferring the worker with the most spare capacity
+            live_workers = get_live_workers()
+            while pending and live_workers:
+                worker = max(live_workers, key=lambda w: (w['capacity'] - assigned.get(w['url'], 0)) / w['capacity'])
+                if worker['capacity'] - assigned.get(worker['url'], 0) <= 0:
+                    break
+                shard = pending.popleft()
+                shard['attempts'] += 1
+                shard_id = f"{timestamp}-{shard['index']}-{shard['attempts']}"
+                try:
+                    dispatch_shard(job, shard, worker['url'], shard_id)
+                except Exception as e:
+                    shard['attempts'] -= 1
+                    pending.appendleft(shard)
+                    state.logs.append(f"Could not dispatch shard {shard['index']} to {worker['url']}: {e}")
+                    live_workers = [w for w in live_workers if w['url'] != worker['url']]
+                    continue
+                active[shard_id] = {'shard': shard, 'worker': worker['url'], 'log_offset': 0, 'failures': 0}
+                assigned[worker['url']] = assigned.get(worker['url'], 0) + 1
+                state.logs.append(f"[shard {shard['index']}] Assigned {len(shard['suites'])} suite(s) to {worker['url']}")
+
+            if pending and not active and not live_workers:
+                workerless_since = workerless_since or time.time()
+                if time.time() - workerless_since > WORKER_HEARTBEAT_TIMEOUT_SECONDS:
+                    raise RuntimeError("No live workers are available to run the remaining shards.")
+            else:
+                workerless_since = None
+
+            for shard_id, entry in list(active.items()):
+                worker_url = entry['worker']
+                if not is_worker_alive(worker_url):
+                    requeue(shard_id, f"Worker {worker_url} stopped sending heartbeats. Reassigning.")
+                    continue
+                try:
+                    shard_status = http_json('GET', f"{worker_url}/worker/shards/{shard_id}?since={entry['log_offset']}")
+                except Exception as e:
+                    entry['failures'] += 1
+                    if entry['failures'] >= 3:
+                        requeue(shard_id, f"Lost contact with {worker_url} ({e}). Reassigning.")
+                    continue
+                entry['failures'] = 0
+                for line in shard_status['logs']:
+                    state.logs.append(f"[shard {entry['shard']['index']}] {line}")
+                entry['log_offset'] = shard_status['log_offset']
+
+                if shard_status['status'] == 'running':
+                    continue
+                if shard_status['status'] == 'failed':
+                    release_shard(worker_url, shard_id)
+                    requeue(shard_id, f"Shard failed on {worker_url}. Reassigning.")
+                    continue
+                destination = os.path.join(shard_output_dir, f"output-{entry['shard']['index']}.xml")
+                try:
+                    if fetch_shard_output(worker_url, shard_id, destination):
+                        shard_outputs.append(destination)
+                except Exception as e:
+                    release_shard(worker_url, shard_id)
+                    requeue(shard_id, f"Could not fetch output from {worker_url} ({e}). Reassigning.")
+                    continue
+                return_codes.append(shard_status['return_code'] or 0)
+                release_shard(worker_url, shard_id)
+                active.pop(shard_id)
+                assigned[worker_url] -= 1
+
+            if pending or active:
+                time.sleep(1)
+    finally:
+        # Stopped or aborted runs must not leave shards running on the workers
+        for shard_id, entry in active.items():
+            release_shard(entry['worker'], shard_id, stop=True)
+
+    state.return_code = max(return_codes, default=0)
+    if shard_outputs:
+        merge_output_files(sorted(shard_outputs), output_dir)
+
+def send_worker_heartbeats():
+    """Registers this worker with the coordinator and keeps the registration alive."""
+    while True:
+        with worker_shards_lock:
+            running = sum(1 for shard in worker_shards.values() if shard['status'] == 'running')
+        try:
+            http_json('POST', f"{COORDINATOR_URL}/workers/heartbeat", {
+                'url': WORKER_URL,
+                'capacity': WORKER_CAPACITY,
+                'running': running
+            }, timeout=5)
+        except Exception as e:
+            print(f"Heartbeat to coordinator {COORDINATOR_URL} failed: {e}")
+        time.sleep(WORKER_HEARTBEAT_INTERVAL_SECONDS)
+
+def prepare_worker_project(project_hash, project_archive=None):
+    """Returns the local copy of a coordinator's project, extracting the archive if one is given."""
+    project_dir = os.path.join(PROJECTS_BASE_DIR, f"worker-{project_hash[:16]}")
+    if os.path.isdir(project_dir):
+        return project_dir
+    if project_archive is None:
+        return None
+    temp_dir = tempfile.mkdtemp(dir=PROJECTS_BASE_DIR)
+    with zipfile.ZipFile(io.BytesIO(base64.b64decode(project_archive))) as archive:
+        archive.extractall(temp_dir)
+    try:
+        os.rename(temp_dir, project_dir)
+    except OSError:
+        # Another shard extracted the same project first
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return project_dir
+
+def rewrite_output_sources(output_xml_path, local_root, source_root):
+    """Maps suite sources in output.xml from this worker's project copy back to the coordinator's paths."""
+    tree = ET.parse(output_xml_path)
+    for element in tree.getroot().iter():
+        source = element.get('source')
+        if source and source.startswith(local_root):
+            element.set('source', source_root + source[len(local_root):])
+    tree.write(output_xml_path, encoding='utf-8', xml_declaration=True)
+
+def run_worker_shard(shard, command, project_dir, source_root):
     try:
         creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
         preexec_fn = os.setsid if os.name != 'nt' else None
-
-        state.process = subprocess.Popen(
+        shard['process'] = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
@@ -330,20 +1045,732 @@ def run_robot_in_thread(command, output_dir, timestamp):
             errors='replace',
             creationflags=creation_flags,
             preexec_fn=preexec_fn,
-            cwd=TESTS_DIRECTORY # Execute from the test directory context
+            cwd=project_dir
         )
-
-        for line in iter(state.process.stdout.readline, ''):
+        for line in iter(shard['process'].stdout.readline, ''):
             if line.strip():
-                state.logs.append(line.strip())
+                shard['logs'].append(line.strip())
+        shard['process'].stdout.close()
+        shard['return_code'] = shard['process'].wait()
+
+        output_xml_path = os.path.join(shard['output_dir'], 'output.xml')
+        if os.path.exists(output_xml_path):
+            rewrite_output_sources(output_xml_path, project_dir, source_root)
+        if shard['status'] == 'running':
+            shard['status'] = 'finished'
+    except Exception as e:
+        shard['logs'].append(f"Shard execution failed: {e}")
+        shard['status'] = 'failed'
+    finally:
+        shard['process'] = None
+        # A shard deleted while robot was still shutting down is cleaned up here, after its last write
+        if shard.get('deleted'):
+            shutil.rmtree(shard['output_dir'], ignore_errors=True)
+
+# --- Resource Profiler ---
+class ResourceSampler:
+    """Periodically samples CPU, memory, file descriptors and child processes of a process group."""
+
+    def __init__(self, process, interval):
+        self.root_pid = process.pid
+        self.interval = interval
+        self.samples = []
+        self.started_at = None
+        self._processes = {}
+        self._stopped = False
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._thread.join(timeout=self.interval * 2)
+
+    def _group_members(self):
+        pids = set()
+        try:
+            root = psutil.Process(self.root_pid)
+            pids.add(root.pid)
+            pids.update(child.pid for child in root.children(recursive=True))
+        except psutil.Error:
+            pass
+        if os.name != 'nt':
+            # Also catch processes that were re-parented but stayed in the os.setsid group
+            try:
+                pgid = os.getpgid(self.root_pid)
+                for proc in psutil.process_iter():
+                    try:
+                        if os.getpgid(proc.pid) == pgid:
+                            pids.add(proc.pid)
+                    except OSError:
+                        continue
+            except OSError:
+                pass
+        return pids
+
+    @staticmethod
+    def _read_metric(getter, *args):
+        """Reads one metric, treating a metric the OS will not expose as unavailable rather than the process as gone."""
+        try:
+            return getter(*args)
+        except psutil.AccessDenied:
+            return None
+
+    def _take_sample(self):
+        pids = self._group_members()
+        cpu = rss = fds = 0
+        alive = 0
+        for pid in pids:
+            proc = self._processes.get(pid)
+            try:
+                if proc is None:
+                    proc = self._processes[pid] = psutil.Process(pid)
+                    # The first cpu_percent call only primes the counter
+                    self._read_metric(proc.cpu_percent, None)
+                else:
+                    cpu += self._read_metric(proc.cpu_percent, None) or 0
+                memory = self._read_metric(proc.memory_info)
+                rss += memory.rss if memory else 0
+                fds += self._read_metric(proc.num_fds if os.name != 'nt' else proc.num_handles) or 0
+                alive += 1
+            except psutil.NoSuchProcess:
+                # The process exited between listing the group and reading it
+                self._processes.pop(pid, None)
+        for pid in list(self._processes):
+            if pid not in pids:
+                self._processes.pop(pid)
+        return {
+            "t": round(time.time(), 3),
+            "cpu_percent": round(cpu, 1),
+            "rss_bytes": rss,
+            "open_fds": fds,
+            "child_processes": max(0, alive - 1)
+        }
+
+    def _run(self):
+        while not self._stopped:
+            if not self._processes and self.samples:
+                # Every process in the group has exited
+                break
+            self.samples.append(self._take_sample())
+            time.sleep(self.interval)
+
+def start_resource_sampler(process, interval=None):
+    if not RESOURCE_PROFILER_ENABLED:
+        return None
+    if psutil is None:
+        state.logs.append("Resource profiling skipped: psutil is not installed.")
+        return None
+    sampler = ResourceSampler(process, interval or RESOURCE_PROFILER_INTERVAL_SECONDS)
+    sampler.start()
+    return sampler
+
+def summarize_test_resources(test, samples):
+    window = [s for s in samples if test['start'] <= s['t'] <= test['end']]
+    approximate = not window
+    if approximate:
+        # The test was shorter than the sampling interval, so use the next sample (or the last one taken)
+        window = [next((s for s in samples if s['t'] > test['end']), samples[-1])]
+    return {
+        "samples": len(window),
+        "approximate": approximate,
+        "peak_rss_bytes": max(s['rss_bytes'] for s in window),
+        "rss_growth_bytes": window[-1]['rss_bytes'] - window[0]['rss_bytes'],
+        "avg_cpu_percent": round(sum(s['cpu_percent'] for s in window) / len(window), 1),
+        "peak_cpu_percent": max(s['cpu_percent'] for s in window),
+        "peak_open_fds": max(s['open_fds'] for s in window),
+        "peak_child_processes": max(s['child_processes'] for s in window)
+    }
+
+def write_resource_profile(sampler, output_dir, timestamp):
+    """Correlates the sampler's timeline with test boundaries and archives it as profile-<timestamp>.json."""
+    samples = sampler.samples
+    if not samples:
+        return None
+
+    tests = []
+    for test in parse_test_timeline_from_xml(output_dir):
+        # Skip tests outside the sampled window, e.g. suites merged from the result cache
+        if test['start'] is None or test['end'] is None or test['end'] < sampler.started_at:
+            continue
+        tests.append(dict(test, resources=summarize_test_resources(test, samples)))
+
+    profile = {
+        "run": timestamp,
+        "interval_seconds": sampler.interval,
+        "started_at": sampler.started_at,
+        "samples": samples,
+        "tests": tests
+    }
+    profile_name = f"profile-{timestamp}.json"
+    with open(os.path.join(REPORTS_DIR, profile_name), 'w', encoding='utf-8') as f:
+        json.dump(profile, f)
+    return profile_name
+
+# --- Search Index ---
+search_index_lock = Lock()
+SEARCH_INDEX_AVAILABLE = False
+RUN_ARTIFACT_PATTERN = re.compile(r'^[a-z]+-(\d{8}-\d{6})\.')
+
+def open_search_index():
+    connection = sqlite3.connect(SEARCH_INDEX_PATH, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    return connection
+
+def init_search_index():
+    global SEARCH_INDEX_AVAILABLE
+    try:
+        connection = open_search_index()
+        try:
+            with connection:
+                tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                if 'search_index' in tables and 'search_documents' not in tables:
+                    # Indexes built before documents moved to their own table cannot be migrated in place
+                    connection.execute("DROP TABLE search_index")
+                    connection.execute("DROP TABLE IF EXISTS indexed_runs")
+                # Documents live in a regular table indexed by run, so a run's rows can be found and
+                # deleted by rowid instead of scanning the whole full-text index
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS search_documents ("
+                    "id INTEGER PRIMARY KEY, run TEXT NOT NULL, kind TEXT NOT NULL, test TEXT, suite TEXT, content TEXT, test_id TEXT)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS search_documents_run ON search_documents (run)")
+                connection.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+                    "test, suite, content, content='search_documents', content_rowid='id', tokenize='unicode61')"
+                )
+                connection.execute("CREATE TABLE IF NOT EXISTS indexed_runs (run TEXT PRIMARY KEY, indexed_at REAL)")
+        finally:
+            connection.close()
+        SEARCH_INDEX_AVAILABLE = True
+    except sqlite3.Error as e:
+        print(f"WARNING: Search index disabled, SQLite FTS5 is not available: {e}")
+
+def collect_search_documents(output_dir, console_lines):
+    """Yields (test, suite, content, kind, test_id) rows for a run's output.xml and console output."""
+    output_xml_path = os.path.join(output_dir, 'output.xml')
+    if os.path.exists(output_xml_path):
+        root = ET.parse(output_xml_path).getroot()
+
+        def visit_suite(suite_element, parent_name):
+            suite_name = f"{parent_name}.{suite_element.get('name')}" if parent_name else suite_element.get('name')
+            for test in suite_element.findall('test'):
+                test_name = test.get('name')
+                test_id = test.get('id')
+                yield test_name, suite_name, '', 'test', test_id
+                status = test.find('status')
+                failure = (status.text or '').strip() if status is not None and status.get('status') == 'FAIL' else ''
+                if failure:
+                    yield test_name, suite_name, failure, 'failure', test_id
+                for msg in test.iter('msg'):
+                    text = (msg.text or '').strip()
+                    # The message that failed the test is already indexed as its failure
+                    if text and not (msg.get('level') == 'FAIL' and text == failure):
+                        yield test_name, suite_name, text[:SEARCH_MAX_MESSAGE_LENGTH], 'message', test_id
+            for child in suite_element.findall('suite'):
+                yield from visit_suite(child, suite_name)
+
+        for suite in root.findall('suite'):
+            yield from visit_suite(suite, None)
+
+    for i in range(0, len(console_lines), SEARCH_CONSOLE_LINES_PER_DOCUMENT):
+        yield '', '', '\n'.join(console_lines[i:i + SEARCH_CONSOLE_LINES_PER_DOCUMENT]), 'console', None
+
+def delete_run_documents(connection, run_id):
+    # External-content FTS5 tables need the original values to remove a row's terms
+    connection.execute(
+        "INSERT INTO search_index (search_index, rowid, test, suite, content) "
+        "SELECT 'delete', id, test, suite, content FROM search_documents WHERE run = ?", (run_id,)
+    )
+    connection.execute("DELETE FROM search_documents WHERE run = ?", (run_id,))
+
+def index_archived_run(output_dir, timestamp, console_lines):
+    """Adds one run to the search index, replacing any earlier rows for the same run."""
+    if not SEARCH_INDEX_AVAILABLE:
+        return
+    rows = [(timestamp, kind, test, suite, content, test_id)
+            for test, suite, content, kind, test_id in collect_search_documents(output_dir, console_lines)]
+    with search_index_lock:
+        connection = open_search_index()
+        try:
+            with connection:
+                delete_run_documents(connection, timestamp)
+                connection.executemany(
+                    "INSERT INTO search_documents (run, kind, test, suite, content, test_id) VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+                connection.execute(
+                    "INSERT INTO search_index (rowid, test, suite, content) "
+                    "SELECT id, test, suite, content FROM search_documents WHERE run = ?", (timestamp,)
+                )
+                connection.execute("INSERT OR REPLACE INTO indexed_runs (run, indexed_at) VALUES (?, ?)", (timestamp, time.time()))
+        finally:
+            connection.close()
+
+def remove_run_from_index(run_id):
+    if not SEARCH_INDEX_AVAILABLE:
+        return
+    with search_index_lock:
+        connection = open_search_index()
+        try:
+            with connection:
+                delete_run_documents(connection, run_id)
+                connection.execute("DELETE FROM indexed_runs WHERE run = ?", (run_id,))
+        finally:
+            connection.close()
+
+def build_fts_query(text):
+    """Quotes each word so user input such as 'element-not-found' is never parsed as FTS5 syntax."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"' for term in terms if term)
+
+# --- Retention ---
+retention_lock = Lock()
+retention_decisions = deque(maxlen=500)
+retention_last_sweep = None
+
+def get_directory_size(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                continue
+    return total
+
+def group_run_artifacts():
+    """Maps each run id (its timestamp) to the archived files that belong to it."""
+    runs = {}
+    for f in os.listdir(REPORTS_DIR):
+        match = RUN_ARTIFACT_PATTERN.match(f)
+        if match:
+            runs.setdefault(match.group(1), []).append(f)
+    return runs
+
+def get_run_age_days(run_id):
+    run_time = datetime.datetime.strptime(run_id, '%Y%m%d-%H%M%S')
+    return (datetime.datetime.now() - run_time).total_seconds() / 86400
+
+def delete_run_artifacts(run_id):
+    """Deletes every archived file of a run and removes the run from the search index."""
+    deleted = []
+    for f in group_run_artifacts().get(run_id, []):
+        os.remove(os.path.join(REPORTS_DIR, f))
+        deleted.append(f)
+    remove_run_from_index(run_id)
+    return deleted
+
+def get_project_root(path):
+    """Returns the top-level copy under PROJECTS_BASE_DIR that contains path, if any."""
+    relative_path = os.path.relpath(os.path.abspath(path), PROJECTS_BASE_DIR)
+    if relative_path.startswith('..'):
+        return None
+    return os.path.join(PROJECTS_BASE_DIR, relative_path.split(os.sep)[0])
+
+def mark_project_used(path):
+    """Touches a project copy so least-recently-used eviction sees it as recently used."""
+    project_root = get_project_root(path)
+    if project_root and os.path.isdir(project_root):
+        os.utime(project_root, None)
+
+def get_protected_projects():
+    protected = set()
+    if TESTS_DIRECTORY:
+        protected.add(get_project_root(TESTS_DIRECTORY))
+    with worker_shards_lock:
+        protected.update(get_project_root(shard['project_dir']) for shard in worker_shards.values())
+    # The active directory may live outside PROJECTS_BASE_DIR
+    protected.discard(None)
+    return protected
+
+def record_retention_decision(action, target, reason, bytes_freed=0, dry_run=False):
+    decision = {
+        "time": datetime.datetime.now().isoformat(timespec='seconds'),
+        "action": action,
+        "target": target,
+        "reason": reason,
+        "bytes_freed": bytes_freed,
+        "dry_run": dry_run
+    }
+    if not dry_run:
+        retention_decisions.appendleft(decision)
+    return decision
+
+def compress_file(file_path):
+    with open(file_path, 'rb') as source, gzip.open(file_path + '.gz', 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.remove(file_path)
+
+def downscale_video(video_path):
+    """Re-encodes a video at RETENTION_VIDEO_DOWNSCALE_HEIGHT in place. Returns False when ffmpeg is unavailable."""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return False
+    root, ext = os.path.splitext(video_path)
+    temp_path = f"{root}.downscaled{ext}"
+    process = subprocess.run(
+        [ffmpeg, '-y', '-v', 'error', '-i', video_path, '-vf', f'scale=-2:{RETENTION_VIDEO_DOWNSCALE_HEIGHT}',
+         '-crf', '32', '-c:a', 'copy', '-movflags', '+faststart', temp_path],
+        capture_output=True, text=True
+    )
+    if process.returncode != 0 or not os.path.exists(temp_path):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise RuntimeError(process.stderr.strip() or 'ffmpeg failed')
+    os.replace(temp_path, video_path)
+    return True
+
+def apply_artifact_retention(f, position, age_days, dry_run):
+    """Compresses, deletes or downscales one archived file as its run's position and age require."""
+    file_path = os.path.join(REPORTS_DIR, f)
+    size = os.path.getsize(file_path)
+    if f.endswith('.html') and position >= RETENTION_KEEP_FULL_RUNS:
+        if not dry_run:
+            compress_file(file_path)
+            size -= os.path.getsize(file_path + '.gz')
+        return record_retention_decision(
+            'compress', f, f"Older than the newest {RETENTION_KEEP_FULL_RUNS} runs", size, dry_run)
+    if f.lower().endswith(VIDEO_EXTENSIONS) and age_days > RETENTION_VIDEO_DELETE_AFTER_DAYS:
+        if not dry_run:
+            os.remove(file_path)
+        return record_retention_decision(
+            'delete_video', f, f"Older than {RETENTION_VIDEO_DELETE_AFTER_DAYS} days", size, dry_run)
+    if f.lower().endswith(VIDEO_EXTENSIONS) and age_days > RETENTION_VIDEO_DOWNSCALE_AFTER_DAYS:
+        probe = probe_video(file_path)
+        if probe is None or probe[2] <= RETENTION_VIDEO_DOWNSCALE_HEIGHT:
+            return None
+        if not dry_run:
+            downscale_video(file_path)
+            size -= os.path.getsize(file_path)
+        return record_retention_decision(
+            'downscale_video', f, f"Older than {RETENTION_VIDEO_DOWNSCALE_AFTER_DAYS} days", size, dry_run)
+    return None
+
+def apply_run_retention(dry_run):
+    decisions = []
+    runs = group_run_artifacts()
+    for position, run_id in enumerate(sorted(runs, reverse=True)):
+        age_days = get_run_age_days(run_id)
+        for f in runs[run_id]:
+            # One bad artifact must not stop the sweep before the disk budget is enforced
+            try:
+                decision = apply_artifact_retention(f, position, age_days, dry_run)
+            except Exception as e:
+                decision = record_retention_decision('failed', f, f"Could not apply retention: {e}", 0, dry_run)
+            if decision:
+                decisions.append(decision)
+    return decisions
+
+def get_project_copies():
+    """Returns project copies as (path, last used time), least recently used first."""
+    copies = []
+    for d in os.listdir(PROJECTS_BASE_DIR):
+        path = os.path.join(PROJECTS_BASE_DIR, d)
+        if os.path.isdir(path):
+            copies.append((path, os.path.getmtime(path)))
+    copies.sort(key=lambda c: c[1])
+    return copies
+
+def evict_project_copy(path, reason, dry_run):
+    size = get_directory_size(path)
+    if not dry_run:
+        shutil.rmtree(path, ignore_errors=True)
+    return record_retention_decision('evict_project', os.path.basename(path), reason, size, dry_run)
+
+def apply_project_retention(dry_run):
+    decisions = []
+    protected = get_protected_projects()
+    all_copies = get_project_copies()
+    copies = [c for c in all_copies if c[0] not in protected]
+    excess = len(all_copies) - RETENTION_MAX_PROJECT_COPIES
+    for path, _ in copies[:max(0, excess)]:
+        decisions.append(evict_project_copy(
+            path, f"More than {RETENTION_MAX_PROJECT_COPIES} project copies, least recently used", dry_run))
+    return decisions
+
+def apply_disk_budget(dry_run, planned_freed):
+    """Evicts the oldest runs beyond the newest RETENTION_KEEP_FULL_RUNS, then project copies, until under budget."""
+    decisions = []
+    usage = get_directory_size(REPORTS_DIR) + get_directory_size(PROJECTS_BASE_DIR) - planned_freed
+    if usage <= RETENTION_DISK_BUDGET_BYTES:
+        return decisions
+
+    runs = group_run_artifacts()
+    for run_id in sorted(runs)[:max(0, len(runs) - RETENTION_KEEP_FULL_RUNS)]:
+        if usage <= RETENTION_DISK_BUDGET_BYTES:
+            return decisions
+        size = sum(os.path.getsize(os.path.join(REPORTS_DIR, f)) for f in runs[run_id])
+        if not dry_run:
+            try:
+                delete_run_artifacts(run_id)
+            except Exception as e:
+                decisions.append(record_retention_decision('failed', run_id, f"Could not delete run: {e}", 0, dry_run))
+                continue
+        decisions.append(record_retention_decision('delete_run', run_id, "Over disk budget, oldest run", size, dry_run))
+        usage -= size
+
+    protected = get_protected_projects()
+    for path, _ in get_project_copies():
+        if usage <= RETENTION_DISK_BUDGET_BYTES:
+            return decisions
+        if path in protected or not os.path.exists(path):
+            continue
+        decision = evict_project_copy(path, "Over disk budget, least recently used project", dry_run)
+        decisions.append(decision)
+        usage -= decision['bytes_freed']
+
+    if usage > RETENTION_DISK_BUDGET_BYTES:
+        decisions.append(record_retention_decision(
+            'over_budget', REPORTS_DIR, f"Still {usage - RETENTION_DISK_BUDGET_BYTES} bytes over budget after eviction", 0, dry_run))
+    return decisions
+
+def run_retention_sweep(dry_run=False):
+    """Applies every retention policy once and returns the decisions taken (or planned, for a dry run)."""
+    global retention_last_sweep
+    with retention_lock:
+        decisions = apply_run_retention(dry_run) + apply_project_retention(dry_run)
+        # Dry runs do not free anything, so account for what the earlier steps would have freed
+        planned_freed = sum(d['bytes_freed'] for d in decisions) if dry_run else 0
+        decisions += apply_disk_budget(dry_run, planned_freed)
+        if not dry_run:
+            retention_last_sweep = datetime.datetime.now().isoformat(timespec='seconds')
+        return decisions
+
+def run_retention_service():
+    while True:
+        time.sleep(RETENTION_INTERVAL_SECONDS)
+        if state.status == 'running':
+            # Archiving happens at the end of a run, so avoid racing it
+            continue
+        try:
+            run_retention_sweep()
+        except Exception as e:
+            print(f"Retention sweep failed: {e}")
+
+# --- Video Processing ---
+def probe_video(video_path):
+    """Returns (duration seconds, width, height) of a video, or None when it cannot be probed."""
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe:
+        process = subprocess.run(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height:format=duration',
+             '-of', 'json', video_path],
+            capture_output=True, text=True, encoding='utf-8', errors='replace'
+        )
+        try:
+            info = json.loads(process.stdout)
+            stream = info['streams'][0]
+            return float(info['format']['duration']), int(stream['width']), int(stream['height'])
+        except (ValueError, KeyError, IndexError):
+            return None
+
+    # Without ffprobe, read the same details from the banner ffmpeg prints for its input
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return None
+    process = subprocess.run([ffmpeg, '-hide_banner', '-i', video_path], capture_output=True, text=True, encoding='utf-8', errors='replace')
+    duration = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', process.stderr)
+    size = re.search(r'Video: .*?(\d{2,5})x(\d{2,5})', process.stderr)
+    if not duration or not size:
+        return None
+    hours, minutes, seconds = duration.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds), int(size.group(1)), int(size.group(2))
+
+def build_video_markers(timeline, video_start, duration):
+    """Places test start and failure times on the video's own timeline, dropping tests it did not record."""
+    markers = []
+    for test in timeline:
+        if test['start'] is None or test['end'] is None:
+            continue
+        start = test['start'] - video_start
+        end = test['end'] - video_start
+        if end < 0 or start > duration:
+            continue
+        markers.append({
+            "type": "test",
+            "time": round(max(0.0, start), 3),
+            "end": round(min(duration, end), 3),
+            "test": test['name'],
+            "suite": test['suite'],
+            "status": test['status']
+        })
+        if test['status'] == 'FAIL':
+            failed_at = (test['failed_at'] or test['end']) - video_start
+            markers.append({
+                "type": "failure",
+                "time": round(min(duration, max(0.0, failed_at)), 3),
+                "test": test['name'],
+                "suite": test['suite'],
+                "message": test['message']
+            })
+    return markers
+
+def format_vtt_time(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+def escape_ffmetadata(value):
+    return re.sub(r'([=;#\\\n])', r'\\\1', value)
+
+def remux_video_with_chapters(ffmpeg, video_path, markers, work_dir):
+    """Rewrites the video in place with its index up front (faststart) and one chapter per test."""
+    metadata_path = os.path.join(work_dir, 'chapters.ffmetadata')
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        f.write(";FFMETADATA1\n")
+        for marker in markers:
+            if marker['type'] != 'test':
+                continue
+            f.write("[CHAPTER]\nTIMEBASE=1/1000\n")
+            f.write(f"START={int(marker['time'] * 1000)}\nEND={int(marker['end'] * 1000)}\n")
+            f.write(f"title={escape_ffmetadata(marker['status'] + ': ' + marker['test'])}\n")
+
+    root, ext = os.path.splitext(video_path)
+    temp_path = f"{root}.remuxed{ext}"
+    command = [ffmpeg, '-y', '-v', 'error', '-i', video_path, '-i', metadata_path,
+               '-map', '0', '-map_metadata', '0', '-map_chapters', '1', '-c', 'copy']
+    if ext.lower() in ('.mp4', '.mov'):
+        command.extend(['-movflags', '+faststart'])
+    process = subprocess.run(command + [temp_path], capture_output=True, text=True, encoding='utf-8', errors='replace')
+    if process.returncode != 0 or not os.path.exists(temp_path):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise RuntimeError(process.stderr.strip() or 'ffmpeg failed')
+    os.replace(temp_path, video_path)
+
+def generate_thumbnail_sprite(ffmpeg, video_path, duration, width, height, timestamp):
+    """Renders evenly spaced frames into one sprite image plus a WebVTT track that maps times to tiles."""
+    interval = max(VIDEO_THUMBNAIL_INTERVAL_SECONDS, duration / VIDEO_THUMBNAIL_MAX_COUNT)
+    count = max(1, int(-(-duration // interval)))
+    columns = min(count, VIDEO_THUMBNAIL_COLUMNS)
+    rows = -(-count // columns)
+    thumb_width = VIDEO_THUMBNAIL_WIDTH
+    thumb_height = max(2, int(round(thumb_width * height / width / 2)) * 2)
+
+    sprite_name = f"thumbs-{timestamp}.jpg"
+    process = subprocess.run(
+        [ffmpeg, '-y', '-v', 'error', '-i', video_path,
+         '-vf', f'fps=1/{interval},scale={thumb_width}:{thumb_height},tile={columns}x{rows}',
+         '-frames:v', '1', '-q:v', '5', os.path.join(REPORTS_DIR, sprite_name)],
+        capture_output=True, text=True, encoding='utf-8', errors='replace'
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip() or 'ffmpeg failed')
+
+    vtt_name = f"thumbnails-{timestamp}.vtt"
+    with open(os.path.join(REPORTS_DIR, vtt_name), 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for i in range(count):
+            x, y = (i % columns) * thumb_width, (i // columns) * thumb_height
+            f.write(f"{format_vtt_time(i * interval)} --> {format_vtt_time(min(duration, (i + 1) * interval))}\n")
+            f.write(f"{sprite_name}#xywh={x},{y},{thumb_width},{thumb_height}\n\n")
+    return {
+        "sprite": sprite_name,
+        "vtt": vtt_name,
+        "interval_seconds": interval,
+        "width": thumb_width,
+        "height": thumb_height,
+        "columns": columns
+    }
+
+def write_chapters_vtt(markers, timestamp):
+    vtt_name = f"chapters-{timestamp}.vtt"
+    with open(os.path.join(REPORTS_DIR, vtt_name), 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for marker in markers:
+            if marker['type'] == 'test':
+                f.write(f"{format_vtt_time(marker['time'])} --> {format_vtt_time(marker['end'])}\n")
+                f.write(f"{marker['status']}: {marker['test']}\n\n")
+    return vtt_name
+
+def process_archived_video(video_path, output_dir, timestamp):
+    """Adds chapters, faststart and a thumbnail sprite to an archived video. Returns the markers file name."""
+    if not VIDEO_PIPELINE_ENABLED:
+        return None
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        state.logs.append("Video processing skipped: ffmpeg was not found on PATH.")
+        return None
 
-        state.process.stdout.close()
-        state.return_code = state.process.wait()
+    probe = probe_video(video_path)
+    if probe is None:
+        state.logs.append(f"Video processing skipped: could not read {os.path.basename(video_path)}.")
+        return None
+    duration, width, height = probe
+    # Recording stops when the video file is last written, so that marks the end of the video
+    video_start = os.path.getmtime(video_path) - duration
+    markers = build_video_markers(parse_test_timeline_from_xml(output_dir), video_start, duration)
+
+    video_info = {"video": os.path.basename(video_path), "duration_seconds": duration, "markers": markers}
+    try:
+        remux_video_with_chapters(ffmpeg, video_path, markers, output_dir)
+    except Exception as e:
+        state.logs.append(f"Could not remux video: {e}")
+    try:
+        video_info["thumbnails"] = generate_thumbnail_sprite(ffmpeg, video_path, duration, width, height, timestamp)
+    except Exception as e:
+        state.logs.append(f"Could not generate video thumbnails: {e}")
+    video_info["chapters"] = write_chapters_vtt(markers, timestamp)
+
+    markers_name = f"markers-{timestamp}.json"
+    with open(os.path.join(REPORTS_DIR, markers_name), 'w', encoding='utf-8') as f:
+        json.dump(video_info, f)
+    failures = sum(1 for m in markers if m['type'] == 'failure')
+    state.logs.append(f"Processed video: {len(markers) - failures} test chapter(s), {failures} failure marker(s).")
+    return markers_name
+
+def execute_robot_command(command):
+    """Runs robot in its own process group and streams its console output into the logs."""
+    creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
+    preexec_fn = os.setsid if os.name != 'nt' else None
+
+    state.process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        creationflags=creation_flags,
+        preexec_fn=preexec_fn,
+        cwd=TESTS_DIRECTORY # Execute from the test directory context
+    )
+    state.resource_sampler = start_resource_sampler(state.process, state.profile_interval)
+
+    for line in iter(state.process.stdout.readline, ''):
+        if line.strip():
+            state.logs.append(line.strip())
+
+    state.process.stdout.close()
+    state.return_code = state.process.wait()
+    if state.resource_sampler:
+        state.resource_sampler.stop()
+
+def run_robot_in_thread(command, output_dir, timestamp, result_cache_plan=None, distributed_job=None):
+    global state
+    output_dir = os.path.abspath(output_dir)
+
+    try:
+        if distributed_job:
+            run_distributed_job(distributed_job, output_dir, timestamp)
+        elif command is None:
+            # Every selected suite was served from the result cache
+            state.logs.append("All selected suites have cached passing results. Skipping execution.")
+            state.return_code = 0
+        else:
+            execute_robot_command(command)
 
         if state.status == "stopped":
             state.logs.append("Execution was manually stopped.")
             return
 
+        if result_cache_plan:
+            apply_result_cache(result_cache_plan, output_dir)
+
         # Parse test statistics
         if os.path.exists(output_dir):
             pass_count, fail_count = parse_test_statistics_from_xml(output_dir)
@@ -364,6 +1791,14 @@ def run_robot_in_thread(command, output_dir, timestamp):
                         shutil.move(temp_file_path, os.path.join(REPORTS_DIR, archived_name))
                         state.log_file = archived_name
 
+            if state.resource_sampler:
+                state.profile_file = write_resource_profile(state.resource_sampler, output_dir, timestamp)
+
+            try:
+                index_archived_run(output_dir, timestamp, list(state.logs))
+            except Exception as e:
+                state.logs.append(f"Error updating search index: {e}")
+
             # Archive video if one was created
             if TESTS_DIRECTORY:
                 video_search_dir = os.path.join(TESTS_DIRECTORY, 'Execution_Videos')
@@ -374,6 +1809,8 @@ def run_robot_in_thread(command, output_dir, timestamp):
                         archived_video_name = f"video-{timestamp}{video_ext}"
                         shutil.move(new_video_path, os.path.join(REPORTS_DIR, archived_video_name))
                         state.video_file = archived_video_name
+                        state.video_markers_file = process_archived_video(
+                            os.path.join(REPORTS_DIR, archived_video_name), output_dir, timestamp)
 
         except Exception as e:
             state.logs.append(f"Error archiving reports/video: {e}")
@@ -405,6 +1842,10 @@ def find_matching_report_file(requested_filename, reports_dir):
     # Direct match
     if os.path.exists(os.path.join(reports_dir, clean_requested)):
         return clean_requested
+
+    # Logs and reports of older runs are gzip-compressed by the retention sweep
+    if os.path.exists(os.path.join(reports_dir, clean_requested + '.gz')):
+        return clean_requested + '.gz'
     
     # If a generic 'log.html' or 'report.html' is requested, find the latest one
     if clean_requested.lower() in ['log.html', 'report.html']:
@@ -599,10 +2040,20 @@ def run_robot_tests():
 
     try:
         data = request.get_json()
+        config = data.get('config', {})
+        profile_interval = config.get('profileIntervalSeconds')
+        if profile_interval is not None:
+            try:
+                profile_interval = float(profile_interval)
+            except (TypeError, ValueError):
+                profile_interval = None
+            if profile_interval is None or not 0 < profile_interval < float('inf'):
+                return jsonify({"status": "error", "message": "profileIntervalSeconds must be a positive number"}), 400
+
         state.reset()
         state.status = "running"
         runType = data.get('runType')
-        config = data.get('config', {})
+        state.profile_interval = profile_interval or RESOURCE_PROFILER_INTERVAL_SECONDS
         
         if runType == 'Orchestrator' and 'orchestratorData' in config:
             state.orchestrator_data = config['orchestratorData']
@@ -619,16 +2070,18 @@ def run_robot_tests():
                 state.logs.append(f"Could not sort by priority: {e}")
 
         tests_to_run_path = TESTS_DIRECTORY
+        mark_project_used(TESTS_DIRECTORY)
         command = ['robot']
         timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
         output_dir = os.path.abspath(os.path.join(tempfile.gettempdir(), f'temp_output_{timestamp}'))
         command.extend(['--outputdir', output_dir])
         
         variable_file_to_cleanup = None
+        robot_options = []
 
         if runType == 'By Tag':
-            if config.get('includeTags'): command.extend(['-i', config['includeTags']])
-            if config.get('excludeTags'): command.extend(['-e', config['excludeTags']])
+            if config.get('includeTags'): robot_options.extend(['-i', config['includeTags']])
+            if config.get('excludeTags'): robot_options.extend(['-e', config['excludeTags']])
         elif runType == 'By Suite' and config.get('suite'):
             suite_path = os.path.join(TESTS_DIRECTORY, config['suite'].replace('/', os.sep))
             if os.path.isfile(suite_path):
@@ -636,15 +2089,42 @@ def run_robot_tests():
             else:
                 return jsonify({"status": "error", "message": f"Suite not found: {suite_path}"}), 404
         elif runType == 'By Test Case' and config.get('testcase'):
-            command.extend(['-t', config['testcase']])
+            robot_options.extend(['-t', config['testcase']])
         elif runType == 'Orchestrator':
             variable_file_to_cleanup = create_variable_file_from_data(timestamp)
             if variable_file_to_cleanup:
                 command.extend(['--variablefile', variable_file_to_cleanup])
 
+        command.extend(robot_options)
+
+        result_cache_plan = None
+        if config.get('useResultCache'):
+            result_cache_plan = plan_cached_run(runType, config, tests_to_run_path)
+            if result_cache_plan['hits']:
+                state.logs.append(f"Result cache: skipping {len(result_cache_plan['hits'])} unchanged passing suite(s).")
+                # Parse only the suites that still need to run, keeping the directory structure intact.
+                # Misses with no tests matching the selection are never cached, so they must not fail the run.
+                command.append('--runemptysuite')
+                for suite_path in result_cache_plan['misses']:
+                    command.extend(['--parseinclude', suite_path])
+
         command.append(tests_to_run_path)
+        if result_cache_plan and not result_cache_plan['misses']:
+            command = None
+
+        distributed_job = None
+        if SERVER_ROLE == 'coordinator' and command is not None and get_live_workers():
+            if result_cache_plan:
+                suite_files = result_cache_plan['misses']
+            elif os.path.isfile(tests_to_run_path):
+                suite_files = [tests_to_run_path]
+            else:
+                suite_files = find_suite_files(tests_to_run_path)
+            if suite_files:
+                distributed_job = create_distributed_job(suite_files, robot_options, variable_file_to_cleanup)
+                state.distributed = True
 
-        thread = Thread(target=run_robot_in_thread, args=(command, output_dir, timestamp))
+        thread = Thread(target=run_robot_in_thread, args=(command, output_dir, timestamp, result_cache_plan, distributed_job))
         thread.daemon = True
         thread.start()
         
@@ -669,24 +2149,274 @@ def get_status():
         "fail_count": state.fail_count,
         "reportFile": state.report_file,
         "logFile": state.log_file,
-        "videoFile": state.video_file
+        "videoFile": state.video_file,
+        "videoMarkersFile": state.video_markers_file,
+        "profileFile": state.profile_file
+    })
+
+@app.route('/profiles/<run_id>', methods=['GET'])
+def get_resource_profile(run_id):
+    """Returns a run's resource timeline. ?sort=peak_rss_bytes&limit=10 ranks tests by a resource metric."""
+    profile_path = os.path.join(REPORTS_DIR, f"profile-{run_id}.json")
+    if not re.match(r'^[0-9-]+$', run_id) or not os.path.exists(profile_path):
+        return jsonify({"error": "Profile not found"}), 404
+    try:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        sort_key = request.args.get('sort')
+        if sort_key:
+            profiled_tests = [t for t in profile['tests'] if t['resources'] and sort_key in t['resources']]
+            profiled_tests.sort(key=lambda t: t['resources'][sort_key], reverse=True)
+            profile['tests'] = profiled_tests[:request.args.get('limit', 10, type=int)]
+        return jsonify(profile)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/search', methods=['GET'])
+def search_runs():
+    """Ranked full-text search over archived runs. Optional filters: kind (test, failure, message, console) and run."""
+    if not SEARCH_INDEX_AVAILABLE:
+        return jsonify({"error": "Search index is not available on this server."}), 503
+    query = build_fts_query(request.args.get('q', ''))
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    filters = []
+    params = [query]
+    for column in ('kind', 'run'):
+        if request.args.get(column):
+            filters.append(f"AND search_documents.{column} = ?")
+            params.append(request.args[column])
+    params.append(limit)
+
+    started = time.time()
+    try:
+        connection = open_search_index()
+        try:
+            rows = connection.execute(
+                "SELECT search_documents.run, search_documents.kind, search_documents.suite, search_documents.test, "
+                "search_documents.test_id, snippet(search_index, -1, '<mark>', '</mark>', '…', 16), "
+                "bm25(search_index, 5.0, 2.0, 1.0) AS score "
+                "FROM search_index JOIN search_documents ON search_documents.id = search_index.rowid "
+                f"WHERE search_index MATCH ? {' '.join(filters)} ORDER BY score LIMIT ?",
+                params
+            ).fetchall()
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Search failed: {str(e)}"}), 500
+
+    hits = []
+    for run, kind, suite, test, test_id, snippet, score in rows:
+        log_file = f"log-{run}.html"
+        hits.append({
+            "run": run,
+            "kind": kind,
+            "suite": suite or None,
+            "test": test or None,
+            "snippet": snippet,
+            "score": round(-score, 3),
+            "logFile": f"{log_file}#{test_id}" if test_id else log_file
+        })
+    return jsonify({"query": request.args.get('q'), "took_ms": round((time.time() - started) * 1000, 2), "hits": hits})
+
+@app.route('/retention', methods=['GET'])
+def get_retention_status():
+    return jsonify({
+        "policy": {
+            "interval_seconds": RETENTION_INTERVAL_SECONDS,
+            "keep_full_runs": RETENTION_KEEP_FULL_RUNS,
+            "video_downscale_after_days": RETENTION_VIDEO_DOWNSCALE_AFTER_DAYS,
+            "video_downscale_height": RETENTION_VIDEO_DOWNSCALE_HEIGHT,
+            "video_delete_after_days": RETENTION_VIDEO_DELETE_AFTER_DAYS,
+            "max_project_copies": RETENTION_MAX_PROJECT_COPIES,
+            "disk_budget_bytes": RETENTION_DISK_BUDGET_BYTES
+        },
+        "usage": {
+            "reports_bytes": get_directory_size(REPORTS_DIR),
+            "projects_bytes": get_directory_size(PROJECTS_BASE_DIR)
+        },
+        "last_sweep": retention_last_sweep,
+        "decisions": list(retention_decisions)
     })
 
+@app.route('/retention/sweep', methods=['POST'])
+def trigger_retention_sweep():
+    """Runs the retention policies now. With ?dry_run=true, returns the decisions without applying them."""
+    if state.status == "running":
+        return jsonify({"status": "error", "message": "Execution in progress"}), 409
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    try:
+        decisions = run_retention_sweep(dry_run)
+        return jsonify({"dry_run": dry_run, "decisions": decisions})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/video-markers/<run_id>', methods=['GET'])
+def get_video_markers(run_id):
+    """Returns a run's video chapters, failure markers and thumbnail sprite details."""
+    markers_path = os.path.join(REPORTS_DIR, f"markers-{run_id}.json")
+    if not re.match(r'^[0-9-]+$', run_id) or not os.path.exists(markers_path):
+        return jsonify({"error": "Video markers not found"}), 404
+    with open(markers_path, 'r', encoding='utf-8') as f:
+        return jsonify(json.load(f))
+
 @app.route('/stop', methods=['POST'])
 def stop_robot_tests():
+    if state.distributed and state.status == "running":
+        # The dispatcher notices this and stops the shards on the workers
+        state.status = "stopped"
+        return jsonify({"status": "success", "message": "Stop signal sent to workers"})
     if state.process and state.process.poll() is None:
         try:
             state.status = "stopped"
             # Terminate the entire process group
-            if os.name == 'nt':
-                state.process.send_signal(signal.CTRL_BREAK_EVENT)
-            else:
-                os.killpg(os.getpgid(state.process.pid), signal.SIGTERM)
+            terminate_process_group(state.process)
             return jsonify({"status": "success", "message": "Stop signal sent"})
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 500
     return jsonify({"status": "info", "message": "No execution running"})
 
+@app.before_request
+def check_cluster_token():
+    if not (request.path == '/workers/heartbeat' or request.path.startswith('/worker/')):
+        return None
+    if CLUSTER_TOKEN:
+        if not hmac.compare_digest(request.headers.get(CLUSTER_TOKEN_HEADER, ''), CLUSTER_TOKEN):
+            return jsonify({"error": "Invalid or missing cluster token"}), 403
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Set ROBOT_MAESTRO_CLUSTER_TOKEN to accept workers from other machines"}), 403
+    return None
+
+@app.route('/workers/heartbeat', methods=['POST'])
+def worker_heartbeat():
+    if SERVER_ROLE != 'coordinator':
+        return jsonify({"error": "This server is not running as a coordinator."}), 400
+    data = request.get_json()
+    worker_url = data.get('url')
+    if not worker_url:
+        return jsonify({"error": "url is required"}), 400
+
+    with workers_lock:
+        is_new = worker_url not in workers
+        workers[worker_url] = {
+            "url": worker_url,
+            "capacity": max(1, int(data.get('capacity', 1))),
+            "running": int(data.get('running', 0)),
+            "last_seen": time.time()
+        }
+    if is_new:
+        print(f"INFO: Worker registered: {worker_url}")
+    return jsonify({"status": "ok"})
+
+@app.route('/workers', methods=['GET'])
+def list_workers():
+    now = time.time()
+    with workers_lock:
+        worker_list = [
+            dict(w, alive=now - w['last_seen'] <= WORKER_HEARTBEAT_TIMEOUT_SECONDS)
+            for w in workers.values()
+        ]
+    return jsonify({"role": SERVER_ROLE, "workers": worker_list})
+
+@app.route('/worker/shards', methods=['POST'])
+def start_worker_shard():
+    if SERVER_ROLE != 'worker':
+        return jsonify({"error": "This server is not running as a worker."}), 400
+    data = request.get_json()
+    shard_id = data.get('shard_id')
+    if not shard_id or not data.get('suites'):
+        return jsonify({"error": "shard_id and suites are required"}), 400
+    if not SHARD_ID_PATTERN.match(shard_id):
+        return jsonify({"error": "shard_id may only contain letters, digits and hyphens"}), 400
+
+    with worker_shards_lock:
+        running = sum(1 for shard in worker_shards.values() if shard['status'] == 'running')
+        if running >= WORKER_CAPACITY:
+            return jsonify({"error": "Worker is at capacity"}), 503
+
+    try:
+        project_dir = prepare_worker_project(data['project_hash'], data.get('project_archive'))
+        if project_dir is None:
+            return jsonify({"error": "Project archive required", "need_project": True}), 409
+        mark_project_used(project_dir)
+
+        output_dir = tempfile.mkdtemp(prefix=f'shard_output_{shard_id}_')
+        # Name the top-level suite after the coordinator's project, not this worker's copy of it
+        suite_name = re.split(r'[\\/]', data['source_root'].rstrip('/\\'))[-1]
+        # Shards are split by file, not by the tag or test filter, so a shard may have no matching tests
+        command = ['robot', '--outputdir', output_dir, '--name', suite_name, '--runemptysuite'] + data.get('robot_options', [])
+        if data.get('variable_file_content'):
+            var_file_path = os.path.join(output_dir, 'orchestrator_vars.py')
+            with open(var_file_path, 'w', encoding='utf-8') as f:
+                f.write(data['variable_file_content'])
+            command.extend(['--variablefile', var_file_path])
+        for suite in data['suites']:
+            command.extend(['--parseinclude', os.path.join(project_dir, suite.replace('/', os.sep))])
+        command.append(project_dir)
+
+        shard = {
+            "status": "running", "logs": [], "return_code": None, "process": None,
+            "output_dir": output_dir, "project_dir": project_dir
+        }
+        with worker_shards_lock:
+            worker_shards[shard_id] = shard
+        thread = Thread(target=run_worker_shard, args=(shard, command, project_dir, data['source_root']))
+        thread.daemon = True
+        thread.start()
+        return jsonify({"status": "running", "shard_id": shard_id})
+    except Exception as e:
+        return jsonify({"error": f"Failed to start shard: {str(e)}"}), 500
+
+@app.route('/worker/shards/<shard_id>', methods=['GET'])
+def get_worker_shard(shard_id):
+    shard = worker_shards.get(shard_id)
+    if shard is None:
+        return jsonify({"error": "Shard not found"}), 404
+    since = request.args.get('since', 0, type=int)
+    logs = shard['logs'][since:]
+    return jsonify({
+        "status": shard['status'],
+        "logs": logs,
+        "log_offset": since + len(logs),
+        "return_code": shard['return_code']
+    })
+
+@app.route('/worker/shards/<shard_id>/output', methods=['GET'])
+def get_worker_shard_output(shard_id):
+    shard = worker_shards.get(shard_id)
+    if shard is None or not os.path.exists(os.path.join(shard['output_dir'], 'output.xml')):
+        return jsonify({"error": "Output not found"}), 404
+    return send_from_directory(shard['output_dir'], 'output.xml')
+
+@app.route('/worker/shards/<shard_id>/stop', methods=['POST'])
+def stop_worker_shard(shard_id):
+    shard = worker_shards.get(shard_id)
+    if shard is None:
+        return jsonify({"error": "Shard not found"}), 404
+    process = shard['process']
+    if process and process.poll() is None:
+        shard['status'] = 'stopped'
+        terminate_process_group(process)
+    return jsonify({"status": shard['status']})
+
+@app.route('/worker/shards/<shard_id>', methods=['DELETE'])
+def delete_worker_shard(shard_id):
+    with worker_shards_lock:
+        shard = worker_shards.pop(shard_id, None)
+    if shard is None:
+        return jsonify({"error": "Shard not found"}), 404
+    shard['deleted'] = True
+    process = shard['process']
+    if process is None:
+        shutil.rmtree(shard['output_dir'], ignore_errors=True)
+    elif process.poll() is None:
+        # Robot writes its outputs while handling SIGTERM, so run_worker_shard removes them afterwards
+        shard['status'] = 'stopped'
+        terminate_process_group(process)
+    return jsonify({"success": f"Deleted shard {shard_id}"})
+
 @app.route('/reports', methods=['GET'])
 def list_reports():
     try:
@@ -713,8 +2443,9 @@ def get_report(filename):
         if not actual_filename:
             return jsonify({"error": "File not found"}), 404
         
-        if actual_filename.endswith('.html'):
-            with open(os.path.join(REPORTS_DIR, actual_filename), 'r', encoding='utf-8') as f:
+        if actual_filename.endswith(('.html', '.html.gz')):
+            open_report = gzip.open if actual_filename.endswith('.gz') else open
+            with open_report(os.path.join(REPORTS_DIR, actual_filename), 'rt', encoding='utf-8') as f:
                 html_content = f.read()
             if 'report-' in actual_filename:
                 timestamp = actual_filename.split('-')[1].split('.')[0]
@@ -767,6 +2498,14 @@ def stream_video(filename):
 @app.route('/delete-report/<filename>', methods=['DELETE'])
 def delete_report(filename):
     try:
+        # Artifacts of a run (report, log, video, profile...) are deleted together,
+        # including files the retention sweep has since compressed
+        match = RUN_ARTIFACT_PATTERN.match(filename)
+        if match:
+            deleted = delete_run_artifacts(match.group(1))
+            if not deleted:
+                return jsonify({"error": "File not found"}), 404
+            return jsonify({"success": f"Deleted {filename}", "deleted": deleted})
         file_path = os.path.join(REPORTS_DIR, filename)
         if os.path.exists(file_path):
             os.remove(file_path)
@@ -777,9 +2516,16 @@ def delete_report(filename):
         return jsonify({"error": str(e)}), 500
 
 
+def start_background_services():
+    init_search_index()
+    Thread(target=run_retention_service, daemon=True).start()
+    if SERVER_ROLE == 'worker' and COORDINATOR_URL:
+        Thread(target=send_worker_heartbeats, daemon=True).start()
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Robot Maestro Backend Server")
+    print(f"✓ Role: {SERVER_ROLE}")
     if TESTS_DIRECTORY:
         print(f"✓ Active Test Directory: {TESTS_DIRECTORY}")
     else:
@@ -787,8 +2533,13 @@ if __name__ == '__main__':
     print(f"✓ Projects Base Directory: {PROJECTS_BASE_DIR}")
     print(f"✓ Reports will be archived in: {REPORTS_DIR}")
     print("=" * 60)
-    print("Starting server on http://127.0.0.1:5001")
-    app.run(host='127.0.0.1', port=5001, debug=True)
+    print(f"Starting server on http://{SERVER_HOST}:{SERVER_PORT}")
+    # With the debug reloader, only the reloaded child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    app.run(host=SERVER_HOST, port=SERVER_PORT, debug=True)
+else:
+    start_background_services()
 
     
     